@@ -4,24 +4,21 @@
 @author: JunLeon
 @time: 2025-03-11
 """
-import joblib
 import streamlit as st
 import numpy as np
-import json
-import torch
+import orjson
 import os
-import base64
-from sklearn.preprocessing import StandardScaler
 
 
 # ============================================
 # 辅助函数
 # ============================================
 
-def img_to_base64(image_path):
-    """将图片转换为Base64编码"""
-    with open(image_path, "rb") as img_file:
-        return base64.b64encode(img_file.read()).decode('utf-8')
+@st.cache_data
+def load_css(css_path):
+    """读取样式表文件并包装为<style>标签"""
+    with open(css_path, 'r', encoding='utf-8') as f:
+        return f"<style>\n{f.read()}</style>"
 
 
 def set_background_image(image_url, opacity):
@@ -43,70 +40,53 @@ def set_background_image(image_url, opacity):
     )
 
 
-# ============================================
-# PyTorch模型定义（必须与训练时完全一致）
-# ============================================
-
-class WinPredictor(torch.nn.Module):
-    def __init__(self, input_dim):
-        super().__init__()
-        self.net = torch.nn.Sequential(
-            torch.nn.Linear(input_dim, 8),
-            torch.nn.ReLU(),
-            torch.nn.Linear(8, 1),
-            torch.nn.Sigmoid()
-        )
-
-    def forward(self, x):
-        return self.net(x)
-
-
 # ============================================
 # 数据加载函数 (使用缓存提高性能)
 # ============================================
 
 @st.cache_resource
-def load_model_and_scaler():
-    """加载PyTorch模型和特征缩放器"""
+def load_model():
+    """加载模型权重（特征标准化已折叠进第一层）"""
     try:
-        # 加载模型
-        model = WinPredictor(input_dim=3)  # 根据实际特征维度修改
-        if os.path.exists('win_predictor.pth'):
-            model.load_state_dict(torch.load('win_predictor.pth'))
-        else:
-            raise FileNotFoundError("模型文件未找到")
-
-        # 加载标准化器
-        if os.path.exists('scaler.pkl'):
-            scaler = joblib.load('scaler.pkl')
+        # 加载模型权重（由export_model.py从PyTorch模型和标准化器离线导出）
+        if os.path.exists('win_predictor.npz'):
+            with np.load('win_predictor.npz') as npz:
+                return npz["w1"], npz["b1"], npz["w2"], npz["b2"]
         else:
-            raise FileNotFoundError("标准化器文件未找到")
-
-        model.eval()  # 设置为评估模式
-        return model, scaler
+            raise FileNotFoundError("模型文件未找到，请先运行 export_model.py")
 
     except Exception as e:
         st.error(f"加载失败: {str(e)}")
         st.stop()
 
 
-@st.cache_resource
-def load_teams_data():
-    """加载队伍数据"""
+def file_mtime(path):
+    """获取文件修改时间，作为磁盘缓存键的一部分（文件缺失时返回None，由加载函数报错）"""
+    return os.path.getmtime(path) if os.path.exists(path) else None
+
+
+@st.cache_data(persist="disk", show_spinner=False)
+def load_teams_data(path, mtime):
+    """加载队伍数据（mtime仅用于缓存键，文件更新后自动失效）"""
     try:
-        with open('merged_teams_data.json', 'r') as f:
-            return json.load(f)
+        with open(path, 'rb') as f:
+            teams_data = orjson.loads(f.read())
+
+        # 地图胜率转换为 (地图, 胜率) 元组，避免下游修改缓存数据
+        for team in teams_data.values():
+            team["map_win_rate"] = tuple(team["map_win_rate"].items())
+        return teams_data
     except Exception as e:
         st.error(f"加载队伍数据失败: {str(e)}")
         st.stop()
 
 
-@st.cache_resource
-def load_team_mapping():
-    """加载队伍名称映射"""
+@st.cache_data(persist="disk", show_spinner=False)
+def load_team_mapping(path, mtime):
+    """加载队伍名称映射（mtime仅用于缓存键，文件更新后自动失效）"""
     try:
-        with open('teams.json', 'r') as f:
-            teams_data = json.load(f)
+        with open(path, 'rb') as f:
+            teams_data = orjson.loads(f.read())
 
         team_name_to_abbr = {}
         for abbr, team_info in teams_data.items():
@@ -118,56 +98,98 @@ def load_team_mapping():
         st.stop()
 
 
-# ============================================
-# 预测函数（修改核心预测逻辑）
-# ============================================
+@st.cache_resource
+def load_teams_stats(teams_data, map_names):
+    """预计算队伍特征表，避免每次预测重复计算"""
+    DEFAULT_WIN_RATE = 0.5
 
-def predict_match(team1_abbr, team2_abbr, map_name, model, scaler, teams_data):
-    """使用PyTorch模型进行预测"""
-    try:
-        team1 = teams_data[team1_abbr]
-        team2 = teams_data[team2_abbr]
+    # 计算全局平均评分（用于缺失评分的队伍）
+    all_ratings = [t.get("avg_rating", 0) for t in teams_data.values()]
+    global_avg_rating = np.mean(all_ratings) if all_ratings else 0
 
-        # 计算全局平均评分
-        all_ratings = [t.get("avg_rating", 0) for t in teams_data.values()]
-        global_avg_rating = np.mean(all_ratings) if all_ratings else 0
+    team_idx = {abbr: i for i, abbr in enumerate(teams_data)}
+    map_idx = {map_name: m for m, map_name in enumerate(map_names)}
 
-        # 特征工程（保持与训练时一致）
-        DEFAULT_WIN_RATE = 0.5
+    # 地图胜率矩阵 (队伍数, 地图数)，前len(map_names)列为可预测地图，其后为数据中的其他地图，缺失记为NaN
+    data_map_idx = dict(map_idx)
+    for team in teams_data.values():
+        for map_name, _ in team["map_win_rate"]:
+            data_map_idx.setdefault(map_name, len(data_map_idx))
+    map_wr = np.full((len(teams_data), len(data_map_idx)), np.nan)
+    for abbr, team in teams_data.items():
+        for map_name, rate in team["map_win_rate"]:
+            map_wr[team_idx[abbr], data_map_idx[map_name]] = rate
 
-        # 生成三个特征
-        map_diff = (
-                team1["map_win_rate"].get(map_name, DEFAULT_WIN_RATE) -
-                team2["map_win_rate"].get(map_name, DEFAULT_WIN_RATE)
-        )
+    # 地图稳定性按队伍自身有数据的全部地图计算（与训练时一致）
+    map_std = np.ma.masked_invalid(map_wr).std(axis=1).filled(0.0)
+    selected_wr = np.nan_to_num(map_wr[:, :len(map_names)], nan=DEFAULT_WIN_RATE)
 
-        t1_rating = team1.get("avg_rating", global_avg_rating)
-        t2_rating = team2.get("avg_rating", global_avg_rating)
-        rating_diff = t1_rating - t2_rating
+    ratings = np.array([team.get("avg_rating", global_avg_rating) for team in teams_data.values()])
 
-        t1_rates = list(team1["map_win_rate"].values()) or [DEFAULT_WIN_RATE]
-        t2_rates = list(team2["map_win_rate"].values()) or [DEFAULT_WIN_RATE]
-        map_stability_diff = np.std(t1_rates) - np.std(t2_rates)
+    # 特征表形状为 (队伍数, 地图数, 3)，最后一维依次为评分、该地图胜率、地图胜率标准差
+    team_features = np.stack(np.broadcast_arrays(
+        ratings[:, None], selected_wr, map_std[:, None]
+    ), axis=-1).astype(np.float32)
+    team_features.flags.writeable = False
 
-        features = [rating_diff, map_diff, map_stability_diff]
+    return {"team_idx": team_idx, "map_idx": map_idx, "team_features": team_features}
 
-        # 特征标准化
-        features_scaled = scaler.transform([features])
 
-        # 转换为PyTorch张量
-        features_tensor = torch.tensor(features_scaled, dtype=torch.float32)
+# ============================================
+# 预测函数（修改核心预测逻辑）
+# ============================================
+
+@st.cache_resource
+def precompute_predictions(weights, teams_stats):
+    """一次性批量计算所有 (A队, B队, 地图) 组合的胜率"""
+    # 特征工程（保持与训练时一致）：评分差、地图胜率差、地图稳定性差
+    team_features = teams_stats["team_features"]
+    features = team_features[:, None] - team_features[None, :]
 
-        # 模型预测
-        with torch.no_grad():
-            prob = model(features_tensor).item()
+    # 模型预测（Linear -> ReLU -> Linear -> Sigmoid，第一层已包含特征标准化）
+    w1, b1, w2, b2 = weights
+    hidden = np.maximum(features.reshape(-1, features.shape[-1]) @ w1 + b1, 0)
+    logit = hidden @ w2 + b2
+    prob = 1 / (1 + np.exp(-logit))
 
-        return {
-            "team1": team1_abbr,
-            "team2": team2_abbr,
-            "map": map_name,
-            "win_prob": round(prob, 3),
-            "confidence": "高可信度" if abs(prob - 0.5) > 0.3 else "需谨慎参考"
-        }
+    # 胜率立方体形状为 (A队, B队, 地图)
+    prob_cube = prob.reshape(features.shape[:-1])
+    prob_cube.flags.writeable = False
+    return prob_cube
+
+
+@st.cache_resource
+def load_predictor():
+    """获取缓存的队伍特征表和胜率立方体"""
+    teams_stats = load_teams_stats(
+        load_teams_data('merged_teams_data.json', file_mtime('merged_teams_data.json')), maps
+    )
+    prob_cube = precompute_predictions(load_model(), teams_stats)
+    return teams_stats, prob_cube
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def lookup_match(team1_abbr, team2_abbr, map_name):
+    """从预计算的胜率立方体中查询预测结果（按队伍和地图缓存，出错时直接抛出，不缓存失败结果）"""
+    teams_stats, prob_cube = load_predictor()
+    i = teams_stats["team_idx"][team1_abbr]
+    j = teams_stats["team_idx"][team2_abbr]
+    m = teams_stats["map_idx"][map_name]
+    prob = float(prob_cube[i, j, m])
+
+    return {
+        "team1": team1_abbr,
+        "team2": team2_abbr,
+        "map": map_name,
+        "win_prob": round(prob, 3),
+        "confidence": "高可信度" if abs(prob - 0.5) > 0.3 else "需谨慎参考"
+    }
+
+
+def predict_match(team1_abbr, team2_abbr, map_name):
+    """查询预测结果，出错时返回错误信息"""
+    try:
+        return lookup_match(team1_abbr, team2_abbr, map_name)
     except Exception as e:
         return {"error": f"预测失败: {str(e)}"}
 
@@ -189,60 +211,23 @@ regions = {
     "VCT AMERICA": ["100T", "C9", "EG", "FUR", "KRU", "LEV", "LOUD", "MIBR", "NRG", "SEN", "G2", "2G"],
 }
 
+# 预计算赛区列表、赛区下标和全部队伍，避免每次重跑时重复构建
+region_keys = tuple(regions)
+region_key_index = {region: i for i, region in enumerate(region_keys)}
+all_teams = tuple(team for region_teams in regions.values() for team in region_teams)
+
 # 定义地图
 maps = ["Ascent", "Bind", "Breeze", "Fracture", "Haven", "Icebox", "Lotus", "Pearl", "Split", "Sunset"]
 
-# 加载队伍图标 (示例，请替换为实际路径)
+# 队伍图标路径（由Streamlit的媒体接口按URL提供，浏览器可缓存，无需内嵌Base64）
+# 按显示宽度区分，图片已由resize_images.py离线缩放，显示时无需Streamlit再缩放和重新编码
 team_images = {
-    team: f"data:image/png;base64,{img_to_base64(f'static/{team}.png')}"
-    for team in sum(regions.values(), [])
+    team: {width: f"static/{team}_{width}.png" for width in (200, 150)}
+    for team in all_teams
 }
 
 # 自定义CSS
-st.markdown("""
-    <style>
-    .stButton>button {
-        width: 100%;
-        height: 60px;
-        font-size: 20px;
-        background-color: #FF0000;
-        color: white;
-        border: none;
-        border-radius: 10px;
-    }
-    .stButton>button:hover {
-        background-color: #CC0000;
-    }
-    .prediction-card {
-        background-color: rgba(255, 255, 255, 0.9);
-        border-radius: 10px;
-        padding: 20px;
-        margin: 10px 0;
-        box-shadow: 0 4px 8px rgba(0, 0, 0, 0.1);
-    }
-    .team-name {
-        font-size: 24px;
-        font-weight: bold;
-        margin-bottom: 10px;
-    }
-    .win-prob {
-        font-size: 28px;
-        font-weight: bold;
-        color: #FF0000;
-    }
-    .confidence {
-        font-size: 16px;
-        color: #555555;
-        margin-top: 10px;
-    }
-    .vs-text {
-        font-size: 32px;
-        font-weight: bold;
-        text-align: center;
-        margin: 20px 0;
-    }
-    </style>
-""", unsafe_allow_html=True)
+st.markdown(load_css('static/app.css'), unsafe_allow_html=True)
 
 
 # ============================================
@@ -255,34 +240,39 @@ def main():
     if "page" not in st.session_state:
         st.session_state.page = "home"
 
-    # 加载数据
-    model, scaler = load_model_and_scaler()
-    teams_data = load_teams_data()
-    team_mapping = load_team_mapping()
+    # 加载数据（启动时即完成胜率预计算）
+    team_mapping = load_team_mapping('teams.json', file_mtime('teams.json'))
+    load_predictor()
 
     # 页面路由
     if st.session_state.page == "home":
-        show_home_page(model, scaler, teams_data)
+        show_home_page()
     elif st.session_state.page == "prediction":
-        show_prediction_page(model, scaler, teams_data)
+        show_prediction_page()
 
 
-def show_home_page(model, scaler, teams_data):
+def show_home_page():
     """显示主页"""
     st.title("无畏契约(VCT)比赛预测系统")
 
     # 初始化session_state中的选择
     if 'a_region' not in st.session_state:
-        st.session_state.a_region = list(regions.keys())[0]
+        st.session_state.a_region = region_keys[0]
     if 'a_team' not in st.session_state:
         st.session_state.a_team = regions[st.session_state.a_region][0]
     if 'b_region' not in st.session_state:
-        st.session_state.b_region = list(regions.keys())[0]
+        st.session_state.b_region = region_keys[0]
     if 'b_team' not in st.session_state:
         st.session_state.b_team = regions[st.session_state.b_region][1]
     if 'selected_map' not in st.session_state:
         st.session_state.selected_map = maps[0]
 
+    show_match_picker()
+
+
+@st.fragment
+def show_match_picker():
+    """显示队伍和地图选择区（作为局部片段，选择变化时只重跑本区域）"""
     # 队伍选择
     col1, col2, col3 = st.columns([4, 1, 4])
 
@@ -291,8 +281,8 @@ def show_home_page(model, scaler, teams_data):
         st.header("A队选择")
         st.session_state.a_region = st.selectbox(
             "选择A队的赛区",
-            list(regions.keys()),
-            index=list(regions.keys()).index(st.session_state.a_region),
+            region_keys,
+            index=region_key_index[st.session_state.a_region],
             key="a_region_select"
         )
 
@@ -310,7 +300,7 @@ def show_home_page(model, scaler, teams_data):
 
         if st.session_state.a_team in team_images:
             st.write(f"你选择的A队是: {st.session_state.a_team}")
-            st.image(team_images[st.session_state.a_team], width=200)
+            st.image(team_images[st.session_state.a_team][200])
 
     # VS标志
     with col2:
@@ -322,16 +312,15 @@ def show_home_page(model, scaler, teams_data):
         st.header("B队选择")
         st.session_state.b_region = st.selectbox(
             "选择B队的赛区",
-            list(regions.keys()),
-            index=list(regions.keys()).index(st.session_state.b_region),
+            region_keys,
+            index=region_key_index[st.session_state.b_region],
             key="b_region_select"
         )
 
-        # 过滤掉A队已选的队伍
-        available_b_teams = [
-            team for team in regions[st.session_state.b_region]
-            if st.session_state.b_region != st.session_state.a_region or team != st.session_state.a_team
-        ]
+        # 过滤掉A队已选的队伍（仅当A、B队同赛区时才需要过滤）
+        available_b_teams = regions[st.session_state.b_region]
+        if st.session_state.b_region == st.session_state.a_region:
+            available_b_teams = [team for team in available_b_teams if team != st.session_state.a_team]
 
         # 更新B队选择
         if st.session_state.b_team not in available_b_teams:
@@ -348,7 +337,7 @@ def show_home_page(model, scaler, teams_data):
 
             if st.session_state.b_team in team_images:
                 st.write(f"你选择的B队是: {st.session_state.b_team}")
-                st.image(team_images[st.session_state.b_team], width=200)
+                st.image(team_images[st.session_state.b_team][200])
         else:
             st.warning("没有可选的队伍，请更改A队或赛区选择")
 
@@ -372,7 +361,7 @@ def show_home_page(model, scaler, teams_data):
                 st.warning("请确保已选择两支不同的队伍和一张地图")
 
 
-def show_prediction_page(model, scaler, teams_data):
+def show_prediction_page():
     """显示预测结果页"""
     st.title("预测结果")
 
@@ -390,7 +379,7 @@ def show_prediction_page(model, scaler, teams_data):
 
     # 执行预测
     with st.spinner("正在计算预测结果..."):
-        result = predict_match(a_team, b_team, selected_map, model, scaler, teams_data)
+        result = predict_match(a_team, b_team, selected_map)
 
     if "error" in result:
         st.error(result["error"])
@@ -402,12 +391,14 @@ def show_prediction_page(model, scaler, teams_data):
     # 显示预测结果
     st.markdown("<div class='prediction-card'>", unsafe_allow_html=True)
 
+    # 队伍图标（一次调用同时渲染两队图标，左A右B）
+    st.image([team_images[a_team][150], team_images[b_team][150]])
+
     # 队伍对比
     col1, col2, col3 = st.columns([4, 2, 4])
 
     with col1:
         st.markdown(f"<div class='team-name'>{a_team}</div>", unsafe_allow_html=True)
-        st.image(team_images[a_team], width=150)
         st.markdown(f"<div class='win-prob'>{result['win_prob'] * 100:.1f}%</div>", unsafe_allow_html=True)
 
     with col2:
@@ -416,7 +407,6 @@ def show_prediction_page(model, scaler, teams_data):
 
     with col3:
         st.markdown(f"<div class='team-name'>{b_team}</div>", unsafe_allow_html=True)
-        st.image(team_images[b_team], width=150)
         st.markdown(f"<div class='win-prob'>{(1 - result['win_prob']) * 100:.1f}%</div>", unsafe_allow_html=True)
 
     # 可信度
@@ -0,0 +1,59 @@
+# -*- coding: UTF-8 -*-
+"""
+@filename: export_model.py
+@desc: 离线将PyTorch模型权重（已折叠特征标准化参数）导出为NumPy格式，
+       供app.py在运行时免加载PyTorch和标准化器直接推理
+
+依赖: pip install -r requirements-export.txt（torch、joblib、scikit-learn仅离线导出需要，app.py运行时不依赖）
+用法: python export_model.py
+"""
+import joblib
+import numpy as np
+import torch
+
+
+# ============================================
+# PyTorch模型定义（必须与训练时完全一致）
+# ============================================
+
+class WinPredictor(torch.nn.Module):
+    def __init__(self, input_dim):
+        super().__init__()
+        self.net = torch.nn.Sequential(
+            torch.nn.Linear(input_dim, 8),
+            torch.nn.ReLU(),
+            torch.nn.Linear(8, 1),
+            torch.nn.Sigmoid()
+        )
+
+    def forward(self, x):
+        return self.net(x)
+
+
+def export_model(model_path='win_predictor.pth', scaler_path='scaler.pkl', output_path='win_predictor.npz'):
+    """导出网络权重（转置为 输入×输出 形状）"""
+    model = WinPredictor(input_dim=3)  # 根据实际特征维度修改
+    model.load_state_dict(torch.load(model_path))
+    model.eval()
+    scaler = joblib.load(scaler_path)
+
+    state = model.state_dict()
+    w1 = state["net.0.weight"].numpy().T.astype(np.float64)
+    b1 = state["net.0.bias"].numpy().astype(np.float64)
+
+    # 将标准化 (x - mean) / scale 折叠进第一层线性变换，推理时可直接输入原始特征
+    w1_folded = w1 / scaler.scale_[:, None]
+    b1_folded = b1 - (scaler.mean_ / scaler.scale_) @ w1
+
+    np.savez(
+        output_path,
+        w1=w1_folded.astype(np.float32),
+        b1=b1_folded.astype(np.float32),
+        w2=state["net.2.weight"].numpy().T,
+        b2=state["net.2.bias"].numpy(),
+    )
+    print(f"模型已导出至 {output_path}")
+
+
+if __name__ == "__main__":
+    export_model()
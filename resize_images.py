@@ -0,0 +1,35 @@
+# -*- coding: UTF-8 -*-
+"""
+@filename: resize_images.py
+@desc: 离线将static目录下的队伍图标缩放为app.py使用的固定宽度，
+       运行时无需Streamlit在每次重跑时缩放和重新编码图片
+
+用法: python resize_images.py
+"""
+import glob
+import os
+
+from PIL import Image
+
+# 与app.py中的图标显示宽度保持一致
+LOGO_WIDTHS = (200, 150)
+
+
+def resize_images(image_dir='static'):
+    """为每个队伍图标生成各显示宽度的PNG（保持宽高比）"""
+    for path in sorted(glob.glob(os.path.join(image_dir, '*.png'))):
+        team = os.path.splitext(os.path.basename(path))[0]
+        if '_' in team:  # 跳过已生成的缩放图
+            continue
+
+        with Image.open(path) as img:
+            img = img.convert('RGBA')
+            for width in LOGO_WIDTHS:
+                height = round(img.height * width / img.width)
+                resized = img.resize((width, height), Image.LANCZOS)
+                resized.save(os.path.join(image_dir, f'{team}_{width}.png'), optimize=True)
+    print(f"图标已缩放至 {image_dir}")
+
+
+if __name__ == "__main__":
+    resize_images()